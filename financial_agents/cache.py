@@ -0,0 +1,59 @@
+import hashlib
+import os
+import threading
+import time
+from typing import Any, Optional, Tuple
+
+import orjson # Faster (de)serialization of large cached API payloads
+
+# Root directory for on-disk caches. Override with FINANCIAL_AGENTS_CACHE_DIR.
+CACHE_DIR = os.environ.get("FINANCIAL_AGENTS_CACHE_DIR", ".cache")
+
+
+class FileCache:
+    """
+    Small JSON file cache. Each entry is stored as `{"ts": ..., "data": ...}`
+    under `<cache_dir>/<namespace>/<blake2b(key)>.json` and expires after `ttl` seconds.
+    """
+
+    def __init__(self, namespace: str, ttl: float, cache_dir: str = CACHE_DIR) -> None:
+        self.ttl = ttl
+        self.directory = os.path.join(cache_dir, namespace)
+
+    def _path(self, key: str) -> str:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).hexdigest()
+        return os.path.join(self.directory, f"{digest}.json")
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value for `key`, or None if missing or expired."""
+        entry = self.get_with_age(key)
+        return entry[0] if entry is not None else None
+
+    def get_with_age(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Return `(value, age in seconds)` for `key`, or None if missing or expired."""
+        try:
+            with open(self._path(key), "rb") as f:
+                raw = f.read()
+            entry = orjson.loads(raw)
+        except (OSError, ValueError):
+            return None
+        age = time.time() - entry.get("ts", 0)
+        if age > self.ttl:
+            return None
+        return entry.get("data"), age
+
+    def set(self, key: str, data: Any) -> None:
+        """Store `data` under `key`. Failures to write are ignored; the cache is best-effort."""
+        path = self._path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            entry = {"ts": time.time(), "data": data}
+            with open(tmp_path, "wb") as f:
+                f.write(orjson.dumps(entry))
+            os.replace(tmp_path, path) # Atomic so concurrent readers never see a partial file
+        except (OSError, TypeError, ValueError):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Optional
 
 from agents import Agent, ModelSettings
 
@@ -76,6 +76,28 @@ class FinancialDataAnalysis(BaseModel):
     risk_factors: Optional[str] = None # Changed to string for simplicity
     """Explicit risk factors mentioned in the input text, or a note if none found."""
 
+    @classmethod
+    def empty(cls) -> "FinancialDataAnalysis":
+        """Placeholder used when financial data retrieval fails; every section reads 'Data not available.'"""
+        return cls(
+            ticker="N/A",
+            company_name="N/A",
+            financial_summary="Failed to retrieve financial data.",
+            company_info_markdown="Data not available.",
+            news_markdown="Data not available.",
+            institutional_ownership_markdown="Data not available.",
+            key_metrics_markdown="Data not available.",
+            segmented_revenues_markdown="Data not available.",
+            income_statements_markdown="Data not available.",
+            balance_sheets_markdown="Data not available.",
+            cash_flows_markdown="Data not available.",
+            insider_trades_markdown="Data not available.",
+            stock_prices_markdown="Data not available.",
+            press_releases_markdown="Data not available.",
+            growth_analysis="Data not available.",
+            risk_factors="Data not available.",
+        )
+
 
 financial_data_agent = Agent(
     name="FinancialDataAgent",
@@ -1,31 +1,344 @@
+import asyncio
+import io
+import logging
 import os
+import random
+import re
+import threading
+import time
+import orjson # Faster JSON decoding for large responses (e.g. price history)
 import requests
-from typing import Any, Dict, List, Optional
-import json # For potential JSON embedding later
-from datetime import datetime, timedelta # Added import
-import math # For number formatting
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, NamedTuple, Optional, Tuple
+from datetime import datetime, timedelta, timezone # Added import
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
 
 from agents import function_tool
 
+from financial_agents.cache import FileCache
+from financial_agents.rate_limit import AdaptiveConcurrencyLimiter, RequestRateLimiter
+
+logger = logging.getLogger(__name__)
+
 API_KEY = os.environ.get("FINANCIAL_DATASETS_API_KEY")
 BASE_URL = "https://api.financialdatasets.ai"
 
+# In-process cache of successful API responses, keyed by request URL.
+# The URL already encodes the endpoint, ticker and every query parameter, so
+# repeated lookups of the same ticker within a session skip the network.
+RESPONSE_CACHE_TTL = 3600  # seconds
+RESPONSE_CACHE_MAXSIZE = 512
+_response_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict() # url -> (expires_at, payload)
+_response_cache_lock = threading.Lock() # Fetches run in worker threads
+
+# Responses are also persisted on disk so they survive restarts. TTLs follow
+# how often each endpoint's data actually changes.
+DAY = 24 * 60 * 60
+DISK_CACHE_TTLS = {
+    "news": 60 * 60,
+    "prices": DAY,
+    "financial-metrics": DAY,
+    "insider-trades": DAY,
+    "earnings/press-releases": DAY,
+    "filings": DAY,
+    "institutional-ownership": 7 * DAY,
+    "company/facts": 30 * DAY,
+    "financials/segmented-revenues": 30 * DAY,
+    "financials/income-statements": 30 * DAY,
+    "financials/balance-sheets": 30 * DAY,
+    "financials/cash-flow-statements": 30 * DAY,
+}
+DEFAULT_DISK_CACHE_TTL = DAY
+_disk_caches: Dict[str, FileCache] = {}
+
+# URLs the API answered with 404 (typically an unknown or delisted ticker),
+# mapped to when that happened and the error raised. Repeat lookups fail fast
+# for NOT_FOUND_CACHE_TTL instead of paying another round trip.
+NOT_FOUND_CACHE_TTL = DAY
+_not_found_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+_not_found_lock = threading.Lock()
+
+# Requests currently in flight, keyed by URL. Concurrent tool calls for the same
+# ticker (e.g. the data agent asking for 'all' and 'news' in parallel) wait on
+# the first request instead of issuing a duplicate one.
+_inflight_requests: Dict[str, "Future[Dict[str, Any]]"] = {}
+_inflight_lock = threading.Lock()
+
+# Accepted values for the financial_data_search arguments.
+VALID_DATA_TYPES = ("income", "balance", "cash-flow", "metrics", "prices", "info",
+                    "press-releases", "segmented-revenues", "sec-filings", "news",
+                    "insider-trades", "institutional-ownership", "all")
+VALID_PERIODS = ("annual", "quarterly")
+VALID_PRICE_INTERVALS = ('second', 'minute', 'day', 'week', 'month', 'year')
+
+# Section titles for each fetched data key, used to flag sections whose request
+# failed so the agent can tell them apart from sections it never asked for.
+SECTION_TITLES = {
+    "company_info": "Company Info",
+    "company_news": "Recent News",
+    "institutional_ownership": "Top Institutional Holders",
+    "metrics": "Key Metrics",
+    "segmented_revenues": "Segmented Revenues",
+    "income_statements": "Income Statements",
+    "balance_sheets": "Balance Sheets",
+    "cash_flow_statements": "Cash Flow Statements",
+    "sec_filings": "SEC Filings",
+    "insider_trades": "Recent Insider Trades",
+    "prices": "Recent Stock Prices",
+    "press_releases": "Latest Earnings Press Release",
+}
+FAILED_SECTION_NOTE = "Not Available (request failed"
+FAILURE_DETAIL_MAX_CHARS = 200
+
+# Shape of an exchange ticker symbol, including share-class suffixes such as BRK.B
+# or BF-B. This only rejects malformed symbols; a one-word company name that
+# fits the shape (e.g. "apple") still passes and is left to the API to reject.
+TICKER_PATTERN = re.compile(r"[A-Z0-9][A-Z0-9.\-]{0,9}")
+
+# Only the newest PRICE_ROWS_SHOWN closes are rendered (the API returns rows oldest
+# first), so by default only request a window that reliably contains that many bars:
+# DEFAULT_PRICE_WINDOW_DAYS per daily bar multiplier (covering weekends and holidays),
+# and for longer intervals enough calendar days per bar (PRICE_INTERVAL_DAYS) for one
+# spare bar.
+PRICE_ROWS_SHOWN = 5
+DEFAULT_PRICE_WINDOW_DAYS = 14
+PRICE_INTERVAL_DAYS = {'second': 0, 'minute': 0, 'day': 1, 'week': 7, 'month': 31, 'year': 366}
+
+# Maximum number of API requests a single tool call keeps in flight, and the
+# ceiling across all concurrent tool calls in the process.
+CONCURRENCY_LIMIT = 5
+MAX_CONCURRENT_REQUESTS = 4 * CONCURRENCY_LIMIT
+
+# Rate-limited (429) and transient server errors are retried with exponential
+# backoff. The delay is tracked per call, so one throttled request never slows
+# down later ones.
+MAX_RETRIES = 3
+RETRY_BASE_DELAY = 1.0  # seconds
+RETRY_MAX_DELAY = 30.0  # seconds
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+# requests has no default timeout, so a stalled connection would hold a worker
+# thread (and the whole tool call) indefinitely. (connect, read) in seconds.
+REQUEST_TIMEOUT = (5, 30)
+
+# Shared across every tool call in the process: how many API requests may be
+# in flight at once, shrinking on 429/5xx responses and growing back on success.
+_request_limiter = AdaptiveConcurrencyLimiter(initial_limit=CONCURRENCY_LIMIT, max_limit=MAX_CONCURRENT_REQUESTS)
+
+def _requests_per_minute_from_env() -> int:
+    """Read FINANCIAL_DATASETS_REQUESTS_PER_MINUTE; blank or invalid values mean unlimited (0)."""
+    value = os.environ.get("FINANCIAL_DATASETS_REQUESTS_PER_MINUTE", "").strip()
+    if not value:
+        return 0
+    try:
+        return int(value)
+    except ValueError:
+        logger.warning("Ignoring non-integer FINANCIAL_DATASETS_REQUESTS_PER_MINUTE=%r; not rate limiting", value)
+        return 0
+
+# Optional requests-per-minute ceiling matching the API plan's quota; 0 (default) means unlimited.
+REQUESTS_PER_MINUTE = _requests_per_minute_from_env()
+_request_rate_limiter = RequestRateLimiter(REQUESTS_PER_MINUTE)
+
+# One HTTP session shared by every request so TCP/TLS connections to the API
+# are kept alive and reused instead of being re-established per call.
+_session = requests.Session()
+_session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENT_REQUESTS))
+
+# Blocking fetches run on a dedicated pool, sized to the HTTP connection pool, so
+# they never queue behind other work on the event loop's default executor.
+_fetch_executor = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_REQUESTS, thread_name_prefix="financial-data")
+
+
+def _disk_cache_for(url: str) -> FileCache:
+    """Return the on-disk cache for the endpoint of `url`."""
+    endpoint = urlsplit(url).path.strip("/")
+    cache = _disk_caches.get(endpoint)
+    if cache is None:
+        ttl = DISK_CACHE_TTLS.get(endpoint, DEFAULT_DISK_CACHE_TTL)
+        cache = _disk_caches.setdefault(endpoint, FileCache(f"financial_data/{endpoint}", ttl=ttl))
+    return cache
+
+def _cache_get(url: str) -> Optional[Dict[str, Any]]:
+    """Look up a cached response, in memory first and then on disk."""
+    with _response_cache_lock:
+        cached = _response_cache.get(url)
+        if cached is not None:
+            expires_at, payload = cached
+            if time.monotonic() < expires_at:
+                _response_cache.move_to_end(url)
+                return payload
+            del _response_cache[url]
+
+    disk_cache = _disk_cache_for(url)
+    entry = disk_cache.get_with_age(url)
+    if entry is None:
+        return None
+    payload, age = entry
+    # Keep the in-memory copy only for what's left of the disk entry's TTL
+    _cache_put(url, payload, ttl=disk_cache.ttl - age, persist=False)
+    return payload
+
+def _cache_put(url: str, payload: Dict[str, Any], ttl: Optional[float] = None, persist: bool = True) -> None:
+    """
+    Store a response in the in-memory cache and, optionally, on disk. The in-memory
+    copy expires after `ttl` (default: the endpoint's disk TTL), capped at RESPONSE_CACHE_TTL.
+    """
+    disk_cache = _disk_cache_for(url)
+    if ttl is None:
+        ttl = disk_cache.ttl
+    with _response_cache_lock:
+        _response_cache[url] = (time.monotonic() + min(ttl, RESPONSE_CACHE_TTL), payload)
+        _response_cache.move_to_end(url)
+        if len(_response_cache) > RESPONSE_CACHE_MAXSIZE:
+            _response_cache.popitem(last=False) # Evict least recently used
+    if persist:
+        disk_cache.set(url, payload)
+
+
+def _not_found_error(url: str) -> Optional[str]:
+    """Return the recorded error message if `url` recently returned 404."""
+    with _not_found_lock:
+        entry = _not_found_cache.get(url)
+        if entry is None:
+            return None
+        recorded_at, error_msg = entry
+        if time.monotonic() - recorded_at < NOT_FOUND_CACHE_TTL:
+            return error_msg
+        del _not_found_cache[url]
+        return None
+
+def _record_not_found(url: str, error_msg: str) -> None:
+    """Remember that `url` returned 404 so later lookups can fail fast."""
+    with _not_found_lock:
+        _not_found_cache[url] = (time.monotonic(), error_msg)
+        _not_found_cache.move_to_end(url)
+        if len(_not_found_cache) > RESPONSE_CACHE_MAXSIZE:
+            _not_found_cache.popitem(last=False)
+
 
 def _make_request(url: str) -> Dict[str, Any]:
     """Make an authenticated request to the API."""
     if not API_KEY:
         raise ValueError("Financial Datasets API key is not set. Please set the FINANCIAL_DATASETS_API_KEY environment variable.")
-    
-    headers = {"X-API-KEY": API_KEY}
-    response = requests.get(url, headers=headers)
-    
-    if response.status_code == 200:
-        return response.json()
-    else:
-        error_msg = f"API request failed with status code {response.status_code}: {response.text}"
-        # Consider logging the error here as well
+
+    cached = _cache_get(url)
+    if cached is not None:
+        logger.debug("Cache hit for %s", url)
+        return cached
+    error_msg = _not_found_error(url)
+    if error_msg is not None:
+        logger.debug("Known 404 for %s", url)
         raise Exception(error_msg)
 
+    with _inflight_lock:
+        future = _inflight_requests.get(url)
+        is_leader = future is None
+        if is_leader:
+            future = _inflight_requests[url] = Future()
+    if not is_leader:
+        return future.result()
+
+    try:
+        payload = _fetch(url)
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    else:
+        future.set_result(payload)
+        return payload
+    finally:
+        with _inflight_lock:
+            del _inflight_requests[url]
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Parse a Retry-After header (delta-seconds or HTTP date) into seconds, if present."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+def _fetch(url: str) -> Dict[str, Any]:
+    """Issue the HTTP request for `url`, retrying throttled calls, and cache a successful response."""
+    headers = {"X-API-KEY": API_KEY}
+    delay = RETRY_BASE_DELAY
+    for attempt in range(MAX_RETRIES + 1):
+        logger.debug("Fetching %s (attempt %d)", url, attempt + 1)
+        _request_rate_limiter.acquire()
+        with _request_limiter:
+            response = _session.get(url, headers=headers, timeout=REQUEST_TIMEOUT)
+
+        if response.status_code == 200:
+            _request_limiter.on_success()
+            payload = orjson.loads(response.content)
+            _cache_put(url, payload)
+            return payload
+        if response.status_code in RETRYABLE_STATUS_CODES:
+            _request_limiter.on_throttle()
+        if response.status_code not in RETRYABLE_STATUS_CODES or attempt == MAX_RETRIES:
+            break
+
+        # Prefer the server's Retry-After; otherwise use decorrelated jitter (each sleep drawn
+        # from [base, 3 * previous sleep]) so fetches throttled together don't retry in lockstep
+        retry_after = _retry_after_seconds(response)
+        if retry_after is not None:
+            if retry_after > RETRY_MAX_DELAY:
+                # Retrying before the server allows would just be throttled again
+                logger.warning("API request for %s returned %d with Retry-After %.0fs; not retrying", url, response.status_code, retry_after)
+                break
+            sleep_for = retry_after
+        else:
+            sleep_for = min(RETRY_MAX_DELAY, random.uniform(RETRY_BASE_DELAY, delay * 3))
+            delay = sleep_for
+        logger.warning("API request for %s returned %d; retrying in %.1fs", url, response.status_code, sleep_for)
+        time.sleep(sleep_for)
+
+    error_msg = f"API request failed with status code {response.status_code}: {response.text}"
+    if response.status_code == 404:
+        _record_not_found(url, error_msg)
+    raise Exception(error_msg)
+
+async def _fetch_concurrently(
+    fetches: Dict[str, Callable[[], Dict[str, Any]]],
+) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+    """
+    Run blocking API fetches in worker threads, at most CONCURRENCY_LIMIT at a time.
+    Returns the successful responses and the failures, both keyed like `fetches`, so a
+    failed or timed-out fetch only costs its own section. Raises only if every fetch failed.
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(CONCURRENCY_LIMIT)
+
+    async def _run(fetch: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+        async with semaphore:
+            return await loop.run_in_executor(_fetch_executor, fetch)
+
+    results = await asyncio.gather(*(_run(fetch) for fetch in fetches.values()), return_exceptions=True)
+    data = {}
+    failures = {}
+    for key, result in zip(fetches.keys(), results):
+        if isinstance(result, Exception):
+            logger.warning("Fetching %s failed: %s", key, result)
+            failures[key] = result
+        else:
+            data[key] = result
+    if failures and not data:
+        raise next(iter(failures.values()))
+    return data, failures
+
 def _get_financial_statements(ticker: str, statement_type: str, period: str = "annual", limit: int = 3) -> Dict[str, Any]:
     """Get financial statements for a company."""
     url = f"{BASE_URL}/financials/{statement_type}?ticker={ticker}&period={period}&limit={limit}"
@@ -83,6 +396,14 @@ def _get_institutional_ownership(ticker: str, limit: int = 10) -> Dict[str, Any]
     url = f"{BASE_URL}/institutional-ownership?ticker={ticker}&limit={limit}" 
     return _make_request(url)
 
+def _default_price_window_days(interval: str, interval_multiplier: int) -> int:
+    """Calendar days to request by default so the price window holds PRICE_ROWS_SHOWN bars."""
+    if interval == 'day':
+        return DEFAULT_PRICE_WINDOW_DAYS * interval_multiplier
+    # Intraday bars fit in the default window; the current week/month/year may still be open
+    bar_days = PRICE_INTERVAL_DAYS[interval] * interval_multiplier
+    return max(DEFAULT_PRICE_WINDOW_DAYS, (PRICE_ROWS_SHOWN + 1) * bar_days)
+
 def _format_number(num):
     """Formats large numbers into readable strings (e.g., 1.23B, 456.7M, 89.1K)."""
     if num is None or not isinstance(num, (int, float)):
@@ -114,33 +435,105 @@ def _get_date_from_datetime(datetime_str):
         return datetime_str[:10]
     return 'N/A'
 
-def _format_financial_data(data: Dict[str, Any], ticker: str) -> str:
-    """Format the retrieved financial data into a detailed Markdown structure."""
-    output = f"## Financial Data Details for {ticker}\n\n"
+def _format_ratio(value):
+    """Formats a per-share value or ratio with 2 decimals, or 'N/A' if it isn't numeric."""
+    return f"{value:.2f}" if isinstance(value, (int, float)) else 'N/A'
+
+def _format_percent(value):
+    """Formats a fraction (e.g. a dividend yield) as a percentage, or 'N/A' if missing."""
+    return f"{value:.2%}" if value is not None else 'N/A'
+
+class PeriodTable(NamedTuple):
+    """
+    Spec for a historical period table: Year | Period | one column per entry in
+    `fields`. `header` must carry a matching column label for each field.
+    """
+    data_key: str  # Key of the endpoint's response in the fetched data
+    list_key: str  # Key of the row list inside that response
+    title: str
+    empty_title: str  # Section title used when the response has no rows
+    header: str
+    fields: Tuple[Tuple[str, Callable[[Any], str]], ...]  # (API field, formatter) per column
+
+_METRICS_TABLE = PeriodTable(
+    data_key="metrics", list_key="financial_metrics",
+    title="Historical Key Metrics", empty_title="Key Metrics",
+    header="| Year | Period | Market Cap     | P/E Ratio      | Dividend Yield |\n",
+    fields=(("market_cap", _format_number), ("price_to_earnings_ratio", _format_ratio), ("dividend_yield", _format_percent)),
+)
+
+_STATEMENT_TABLES = (
+    PeriodTable(
+        data_key="income_statements", list_key="income_statements",
+        title="Historical Income Statements", empty_title="Income Statements",
+        header="| Year | Period | Revenue        | Net Income     | EPS Diluted    |\n",
+        fields=(("revenue", _format_number), ("net_income", _format_number), ("earnings_per_share_diluted", _format_ratio)),
+    ),
+    PeriodTable(
+        data_key="balance_sheets", list_key="balance_sheets",
+        title="Historical Balance Sheets", empty_title="Balance Sheets",
+        header="| Year | Period | Total Assets   | Total Liab.  | Total Equity   |\n",
+        fields=(("total_assets", _format_number), ("total_liabilities", _format_number), ("shareholders_equity", _format_number)),
+    ),
+    PeriodTable(
+        data_key="cash_flow_statements", list_key="cash_flow_statements",
+        title="Historical Cash Flow Statements", empty_title="Cash Flow Statements",
+        header="| Year | Period | Operating CF   | Investing CF   | Free CF        |\n",
+        fields=(("net_cash_flow_from_operations", _format_number), ("net_cash_flow_from_investing", _format_number), ("free_cash_flow", _format_number)),
+    ),
+)
+
+def _format_period_table(output: io.StringIO, data: Dict[str, Any], table: PeriodTable) -> None:
+    """Write one period table from `_METRICS_TABLE` / `_STATEMENT_TABLES` as Markdown."""
+    table_data = data.get(table.data_key)
+    if not table_data:
+        return
+    rows = table_data.get(table.list_key, [])
+    if not rows:
+        output.write(f"\n### {table.empty_title}\nNot Available\n\n")
+        return
+    output.write(f"\n### {table.title}\n\n")
+    output.write(table.header)
+    output.write("|------|--------|" + "----------------|" * len(table.fields) + "\n")
+    for row in rows:
+        year = _get_year_from_date(row.get('report_period'))
+        period = str(row.get('period','N/A')).replace("|", "/")
+        cells = " | ".join(f"{formatter(row.get(key)):<14}" for key, formatter in table.fields)
+        output.write(f"| {year} | {period:<6} | {cells} |\n")
+    output.write("\n")
+
+def _format_financial_data(data: Dict[str, Any], ticker: str, failures: Optional[Dict[str, Exception]] = None) -> str:
+    """
+    Format the retrieved financial data into a detailed Markdown structure. Each entry
+    in `failures` is rendered as a "Not Available (request failed: ...)" section.
+    """
+    # Sections are appended to one buffer rather than by repeated string concatenation
+    output = io.StringIO()
+    output.write(f"## Financial Data Details for {ticker}\n\n")
     
     # News (Top) - Assuming this part is correct as per user feedback
     news_data = data.get("company_news")
     if news_data:
         news_list = news_data.get("news", [])
         if news_list:
-            output += "\n### Recent News\n\n"
+            output.write("\n### Recent News\n\n")
             for news_item in news_list:
                 title = str(news_item.get('title', 'N/A')).replace("*", "")
                 source = str(news_item.get('source', 'N/A')).replace("*", "")
                 date_str = _get_date_from_datetime(news_item.get('date', 'N/A'))
                 url = news_item.get('url', '#')
-                output += f"* [{date_str}]: [{title}]({url}) ({source})\n"
-            output += "\n"
+                output.write(f"* [{date_str}]: [{title}]({url}) ({source})\n")
+            output.write("\n")
         else:
-            output += "\n### Recent News\nNot Available\n\n"
+            output.write("\n### Recent News\nNot Available\n\n")
             
     # Company Info
     info_data = data.get("company_info")
     if info_data:
         company_facts = info_data.get("company_facts", {}) # Use company_facts key
-        output += f"Company: {company_facts.get('name', ticker)}\n" # Use name from facts
-        output += f"Industry: {company_facts.get('industry', 'N/A')}\n"
-        output += f"Sector: {company_facts.get('sector', 'N/A')}\n\n"
+        output.write(f"Company: {company_facts.get('name', ticker)}\n") # Use name from facts
+        output.write(f"Industry: {company_facts.get('industry', 'N/A')}\n")
+        output.write(f"Sector: {company_facts.get('sector', 'N/A')}\n\n")
     
     # Institutional Ownership
     inst_ownership_data = data.get("institutional_ownership")
@@ -148,41 +541,21 @@ def _format_financial_data(data: Dict[str, Any], ticker: str) -> str:
          # Access the list correctly
         owners = inst_ownership_data.get("institutional_ownership", [])
         if owners:
-            output += "\n### Top Institutional Holders\n\n"
-            output += "| Holder Name                | Shares Held   | Reported Date |\n"
-            output += "|----------------------------|---------------|---------------|\n"
+            output.write("\n### Top Institutional Holders\n\n")
+            output.write("| Holder Name                | Shares Held   | Reported Date |\n")
+            output.write("|----------------------------|---------------|---------------|\n")
             for owner in owners:
                  # Use correct keys from JSON
                  name = str(owner.get('investor', 'N/A')).replace("|", "/")
                  shares = _format_number(owner.get('shares')) # Format shares
                  date = str(owner.get('report_period', 'N/A')).replace("|", "/")
-                 output += f"| {name:<26} | {shares:<13} | {date:<13} |\n"
-            output += "\n"
+                 output.write(f"| {name:<26} | {shares:<13} | {date:<13} |\n")
+            output.write("\n")
         else:
-            output += "\n### Top Institutional Holders\nNot Available\n\n"
+            output.write("\n### Top Institutional Holders\nNot Available\n\n")
             
     # Metrics
-    metrics_data = data.get("metrics")
-    if metrics_data:
-        # Access the list correctly
-        metrics_list = metrics_data.get("financial_metrics", []) 
-        if metrics_list:
-            output += f"\n### Historical Key Metrics\n\n"
-            output += "| Year | Period | Market Cap     | P/E Ratio      | Dividend Yield |\n"
-            output += "|------|--------|----------------|----------------|----------------|\n"
-            for metric_period in metrics_list: 
-                 # Use correct keys and helper
-                 year = _get_year_from_date(metric_period.get('report_period'))
-                 period = str(metric_period.get('period','N/A')).replace("|", "/")
-                 mcap = _format_number(metric_period.get('market_cap'))
-                 pe = f"{metric_period.get('price_to_earnings_ratio', 'N/A'):.2f}" if metric_period.get('price_to_earnings_ratio') is not None else 'N/A'
-                 # Assuming dividend_yield key exists, format it; otherwise N/A
-                 divy_raw = metric_period.get('dividend_yield') 
-                 divy = f"{divy_raw:.2%}" if divy_raw is not None else 'N/A' 
-                 output += f"| {year} | {period:<6} | {mcap:<14} | {pe:<14} | {divy:<14} |\n"
-            output += "\n"
-        else:
-            output += "\n### Key Metrics\nNot Available\n\n"
+    _format_period_table(output, data, _METRICS_TABLE)
     
     # Segmented Revenues - Simplified Logic
     segmented_revenues_data = data.get("segmented_revenues")
@@ -191,7 +564,7 @@ def _format_financial_data(data: Dict[str, Any], ticker: str) -> str:
         if segments_reports:
             latest_report = segments_reports[0] # Process only the latest report period
             report_period_label = f"{latest_report.get('period', 'N/A')} {latest_report.get('report_period', 'N/A')}"
-            output += f"\n### Segmented Revenues ({report_period_label})\n\n"
+            output.write(f"\n### Segmented Revenues ({report_period_label})\n\n")
             
             revenue_items = []
             for item in latest_report.get("items", []):
@@ -205,77 +578,23 @@ def _format_financial_data(data: Dict[str, Any], ticker: str) -> str:
                          revenue_items.append({'label': label, 'amount': amount})
             
             if revenue_items:
-                output += "| Segment                     | Revenue       |\n"
-                output += "|---------------------------|---------------|\n"
+                output.write("| Segment                     | Revenue       |\n")
+                output.write("|---------------------------|---------------|\n")
                 # Sort by amount descending for clarity
                 revenue_items.sort(key=lambda x: x['amount'], reverse=True)
                 for item in revenue_items:
                      clean_label = str(item['label']).replace("|", "/")
                      clean_amount = _format_number(item['amount'])
-                     output += f"| {clean_label:<25} | {clean_amount:<13} |\n"
-                output += "\n"
+                     output.write(f"| {clean_label:<25} | {clean_amount:<13} |\n")
+                output.write("\n")
             else:
-                 output += "Segment revenue data not available or not in expected format.\n\n"
+                 output.write("Segment revenue data not available or not in expected format.\n\n")
         else:
-            output += "\n### Segmented Revenues\nNot Available\n\n"
-
-    # Financial Statements (Income)
-    income_statements_data = data.get("income_statements")
-    if income_statements_data:
-        income_list = income_statements_data.get("income_statements", [])
-        if income_list:
-            output += f"\n### Historical Income Statements\n\n"
-            output += "| Year | Period | Revenue        | Net Income     | EPS Diluted    |\n"
-            output += "|------|--------|----------------|----------------|----------------|\n"
-            for statement in income_list:
-                 year = _get_year_from_date(statement.get('report_period'))
-                 period = str(statement.get('period','N/A')).replace("|", "/")
-                 rev = _format_number(statement.get('revenue'))
-                 ni = _format_number(statement.get('net_income')) # Correct key
-                 eps_diluted = statement.get('earnings_per_share_diluted', 'N/A') # Correct key
-                 eps = f"{eps_diluted:.2f}" if isinstance(eps_diluted, (int, float)) else 'N/A'
-                 output += f"| {year} | {period:<6} | {rev:<14} | {ni:<14} | {eps:<14} |\n"
-            output += "\n"
-        else:
-             output += "\n### Income Statements\nNot Available\n\n"
-    
-    # Financial Statements (Balance Sheet)
-    balance_sheets_data = data.get("balance_sheets")
-    if balance_sheets_data:
-        balance_list = balance_sheets_data.get("balance_sheets", [])
-        if balance_list:
-            output += f"\n### Historical Balance Sheets\n\n"
-            output += "| Year | Period | Total Assets   | Total Liab.  | Total Equity   |\n"
-            output += "|------|--------|----------------|----------------|----------------|\n"
-            for statement in balance_list:
-                 year = _get_year_from_date(statement.get('report_period'))
-                 period = str(statement.get('period','N/A')).replace("|", "/")
-                 assets = _format_number(statement.get('total_assets')) # Correct key
-                 liab = _format_number(statement.get('total_liabilities')) # Correct key
-                 equity = _format_number(statement.get('shareholders_equity')) # Correct key
-                 output += f"| {year} | {period:<6} | {assets:<14} | {liab:<14} | {equity:<14} |\n"
-            output += "\n"
-        else:
-             output += "\n### Balance Sheets\nNot Available\n\n"
-    
-    # Financial Statements (Cash Flow)
-    cash_flow_statements_data = data.get("cash_flow_statements")
-    if cash_flow_statements_data:
-        cash_flow_list = cash_flow_statements_data.get("cash_flow_statements", [])
-        if cash_flow_list:
-            output += f"\n### Historical Cash Flow Statements\n\n"
-            output += "| Year | Period | Operating CF   | Investing CF   | Free CF        |\n"
-            output += "|------|--------|----------------|----------------|----------------|\n"
-            for statement in cash_flow_list:
-                 year = _get_year_from_date(statement.get('report_period'))
-                 period = str(statement.get('period','N/A')).replace("|", "/")
-                 ocf = _format_number(statement.get('net_cash_flow_from_operations')) # Correct key
-                 icf = _format_number(statement.get('net_cash_flow_from_investing')) # Correct key
-                 fcf = _format_number(statement.get('free_cash_flow')) # Correct key
-                 output += f"| {year} | {period:<6} | {ocf:<14} | {icf:<14} | {fcf:<14} |\n"
-            output += "\n"
-        else:
-             output += "\n### Cash Flow Statements\nNot Available\n\n"
+            output.write("\n### Segmented Revenues\nNot Available\n\n")
+
+    # Financial Statements (Income, Balance Sheet, Cash Flow)
+    for table in _STATEMENT_TABLES:
+        _format_period_table(output, data, table)
 
     # SEC Filings (Keep commented out as per original code)
     # ...
@@ -293,9 +612,9 @@ def _format_financial_data(data: Dict[str, Any], ticker: str) -> str:
                 actual_trades.append(trade)
                 
         if actual_trades: # Check if there are any actual trades to show
-            output += "\n### Recent Insider Trades\n\n"
-            output += "| Date       | Insider Name      | Title/Rel.     | Type | Shares       | Value ($)   |\n"
-            output += "|------------|-------------------|----------------|------|--------------|-------------|\n"
+            output.write("\n### Recent Insider Trades\n\n")
+            output.write("| Date       | Insider Name      | Title/Rel.     | Type | Shares       | Value ($)   |\n")
+            output.write("|------------|-------------------|----------------|------|--------------|-------------|\n")
             for trade in actual_trades:
                 # Use transaction_date, fallback to filing_date if needed
                 trans_date = trade.get('transaction_date')
@@ -314,14 +633,14 @@ def _format_financial_data(data: Dict[str, Any], ticker: str) -> str:
                 shares_str = _format_number(shares_num)
                 value_str = _format_number(trade.get('transaction_value'))
                 
-                output += f"| {date:<10} | {name:<17} | {title_short:<14} | {type_symbol:<4} | {shares_str:<12} | {value_str:<11} |\n"
-            output += "\n"
+                output.write(f"| {date:<10} | {name:<17} | {title_short:<14} | {type_symbol:<4} | {shares_str:<12} | {value_str:<11} |\n")
+            output.write("\n")
         else:
             # Message when the list exists but contains no actual trades
-            output += "\n### Recent Insider Trades\nNo recent transactional insider trades found.\n\n"
+            output.write("\n### Recent Insider Trades\nNo recent transactional insider trades found.\n\n")
     # If insider_trades_data itself is missing or the inner list is empty originally
     # else: 
-    #    output += "\n### Recent Insider Trades\nNot Available\n\n" 
+    #    output.write("\n### Recent Insider Trades\nNot Available\n\n") 
     # Keep original behaviour: if no data, section is omitted implicitly
              
     # Stock Price
@@ -329,19 +648,21 @@ def _format_financial_data(data: Dict[str, Any], ticker: str) -> str:
     if prices_data:
         prices_list = prices_data.get("prices", [])
         if prices_list:
-            output += "\n### Recent Stock Prices (Daily Close)\n\n"
-            output += "| Date       | Close Price    |\n"
-            output += "|------------|----------------|\n"
-            # Show the last 5 prices (or fewer if less data available)
-            for price_point in prices_list[:5]: # Iterate through the first 5 (most recent)
+            output.write("\n### Recent Stock Prices (Daily Close)\n\n")
+            output.write("| Date       | Close Price    |\n")
+            output.write("|------------|----------------|\n")
+            # Show the newest PRICE_ROWS_SHOWN prices (or fewer if less data available), oldest
+            # to newest. Sorting by time doesn't rely on the API's (oldest-first) row order.
+            recent_prices = sorted(prices_list, key=lambda p: p.get('time') or '')[-PRICE_ROWS_SHOWN:]
+            for price_point in recent_prices:
                  # Use correct key and helper
                  date = _get_date_from_datetime(price_point.get('time'))
                  close_raw = price_point.get('close')
                  close = f"{close_raw:.2f}" if isinstance(close_raw, (int, float)) else 'N/A'
-                 output += f"| {date} | {close:<14} |\n"
-            output += "\n"
+                 output.write(f"| {date} | {close:<14} |\n")
+            output.write("\n")
         else:
-            output += "\n### Recent Stock Prices\nNot Available\n\n"
+            output.write("\n### Recent Stock Prices\nNot Available\n\n")
             
     # Press Releases (Using the user-reverted logic)
     press_releases_data = data.get("press_releases")
@@ -349,15 +670,20 @@ def _format_financial_data(data: Dict[str, Any], ticker: str) -> str:
         releases = press_releases_data.get("press_releases", [])
         if releases:
             latest = releases[0]
-            output += "\n### Latest Earnings Press Release\n\n"
+            output.write("\n### Latest Earnings Press Release\n\n")
             # Avoid potential bolding/italics in title
             title = latest.get('title', 'N/A').replace("*", "")
-            output += f"Title: {title}\n"
-            output += f"Date: {latest.get('date', 'N/A')}\n\n"
+            output.write(f"Title: {title}\n")
+            output.write(f"Date: {latest.get('date', 'N/A')}\n\n")
         else:
-            output += "\n### Latest Earnings Press Release\nNot Available\n\n"
+            output.write("\n### Latest Earnings Press Release\nNot Available\n\n")
+
+    # Sections whose request failed
+    for key, error in (failures or {}).items():
+        detail = (str(error).splitlines() or [type(error).__name__])[0][:FAILURE_DETAIL_MAX_CHARS]
+        output.write(f"\n### {SECTION_TITLES.get(key, key)}\n{FAILED_SECTION_NOTE}: {detail})\n\n")
             
-    return output.strip()
+    return output.getvalue().strip()
 
 
 @function_tool
@@ -396,7 +722,7 @@ async def financial_data_search(ticker: str,
         inst_ownership_limit: Optional limit for top institutional owners. Defaults to 10.
         price_interval: Optional interval for stock prices ('second', 'minute', 'day', 'week', 'month', 'year'). Defaults to 'day'.
         price_interval_multiplier: Optional multiplier for the price interval (e.g., 5 for 5-minute interval). Defaults to 1.
-        price_start_date: Optional start date for price data (YYYY-MM-DD). Defaults to 90 days ago.
+        price_start_date: Optional start date for price data (YYYY-MM-DD). Defaults to a window covering the last few intervals (14 days for daily prices).
         price_end_date: Optional end date for price data (YYYY-MM-DD). Defaults to today.
         price_limit: Optional limit for historical stock prices. Defaults to 5000 (API default).
         
@@ -404,71 +730,65 @@ async def financial_data_search(ticker: str,
         Formatted Markdown string containing detailed financial data tables and lists, or raw JSON if formatting fails.
     """
     try:
-        result = {}
-        ticker = ticker.upper() 
+        ticker = ticker.strip().upper()
+        if not ticker:
+            # Every endpoint is keyed by ticker; don't spend API calls (and retries) on an empty one
+            return "Error: No ticker provided. Resolve the company's ticker symbol before calling this tool."
+        if not TICKER_PATTERN.fullmatch(ticker):
+            # e.g. spaces or punctuation from a multi-word name; every endpoint would 404
+            return f"Error: Malformed ticker '{ticker}'. Pass an exchange ticker symbol such as AAPL or BRK.B."
         
-        valid_data_types = ["income", "balance", "cash-flow", "metrics", "prices", "info", 
-                            "press-releases", "segmented-revenues", "sec-filings", "news", 
-                            "insider-trades", "institutional-ownership", "all"]
-        if data_type not in valid_data_types:
-            return f"Error: Invalid data_type '{data_type}'. Must be one of {valid_data_types}"
+        if data_type not in VALID_DATA_TYPES:
+            return f"Error: Invalid data_type '{data_type}'. Must be one of {list(VALID_DATA_TYPES)}"
             
-        valid_periods = ["annual", "quarterly"]
-        if metrics_period and metrics_period not in valid_periods:
-             return f"Error: Invalid metrics_period '{metrics_period}'. Must be one of {valid_periods}"
-        if segmented_period and segmented_period not in valid_periods:
-             return f"Error: Invalid segmented_period '{segmented_period}'. Must be one of {valid_periods}"
+        if metrics_period and metrics_period not in VALID_PERIODS:
+             return f"Error: Invalid metrics_period '{metrics_period}'. Must be one of {list(VALID_PERIODS)}"
+        if segmented_period and segmented_period not in VALID_PERIODS:
+             return f"Error: Invalid segmented_period '{segmented_period}'. Must be one of {list(VALID_PERIODS)}"
              
-        valid_price_intervals = ['second', 'minute', 'day', 'week', 'month', 'year']
-        if price_interval and price_interval not in valid_price_intervals:
-            return f"Error: Invalid price_interval '{price_interval}'. Must be one of {valid_price_intervals}"
+        if price_interval and price_interval not in VALID_PRICE_INTERVALS:
+            return f"Error: Invalid price_interval '{price_interval}'. Must be one of {list(VALID_PRICE_INTERVALS)}"
             
         if price_interval_multiplier is not None and price_interval_multiplier < 1:
             return f"Error: Invalid price_interval_multiplier '{price_interval_multiplier}'. Must be >= 1."
 
         effective_data_type = data_type if data_type else "all"
 
-        # Fetch data based on data_type
+        # Collect the fetches for the requested data_type, then run them concurrently
+        fetches: Dict[str, Callable[[], Dict[str, Any]]] = {}
         if effective_data_type in ["info", "all"]:
-            result["company_info"] = _get_company_info(ticker)
+            fetches["company_info"] = partial(_get_company_info, ticker)
         
         if effective_data_type in ["news", "all"]:
             limit_to_use = news_limit if news_limit else 5
-            result["company_news"] = _get_company_news(ticker, limit=limit_to_use)
+            fetches["company_news"] = partial(_get_company_news, ticker, limit=limit_to_use)
 
         if effective_data_type in ["institutional-ownership", "all"]:
             limit_to_use = inst_ownership_limit if inst_ownership_limit else 10
-            result["institutional_ownership"] = _get_institutional_ownership(ticker, limit=limit_to_use)
+            fetches["institutional_ownership"] = partial(_get_institutional_ownership, ticker, limit=limit_to_use)
             
         if effective_data_type in ["metrics", "all"]:
             period_to_use = metrics_period if metrics_period else "annual"
             limit_to_use = metrics_limit if metrics_limit else 3
-            result["metrics"] = _get_company_metrics(ticker, period=period_to_use, limit=limit_to_use)
+            fetches["metrics"] = partial(_get_company_metrics, ticker, period=period_to_use, limit=limit_to_use)
             
         if effective_data_type in ["segmented-revenues", "all"]:
             period_to_use = segmented_period if segmented_period else "annual"
             limit_to_use = segmented_limit if segmented_limit else 1
-            result["segmented_revenues"] = _get_segmented_revenues(ticker, period=period_to_use, limit=limit_to_use)
+            fetches["segmented_revenues"] = partial(_get_segmented_revenues, ticker, period=period_to_use, limit=limit_to_use)
 
         if effective_data_type in ["income", "all"]:
-            result["income_statements"] = _get_financial_statements(ticker, "income-statements", period="annual", limit=3)
+            fetches["income_statements"] = partial(_get_financial_statements, ticker, "income-statements", period="annual", limit=3)
 
         if effective_data_type in ["balance", "all"]:
-            result["balance_sheets"] = _get_financial_statements(ticker, "balance-sheets", period="annual", limit=3)
+            fetches["balance_sheets"] = partial(_get_financial_statements, ticker, "balance-sheets", period="annual", limit=3)
 
         if effective_data_type in ["cash-flow", "all"]:
-            result["cash_flow_statements"] = _get_financial_statements(ticker, "cash-flow-statements", period="annual", limit=3)
-
-
-        #if effective_data_type in ["sec-filings", "all"]:
-        #    limit_to_use = filings_limit if filings_limit else 5
-        #    result["sec_filings"] = _get_sec_filings(ticker, limit=limit_to_use)
-#
-        #print("Debug: sec_filings", result["sec_filings"])
+            fetches["cash_flow_statements"] = partial(_get_financial_statements, ticker, "cash-flow-statements", period="annual", limit=3)
 
         if effective_data_type in ["insider-trades", "all"]:
             limit_to_use = insider_trades_limit if insider_trades_limit else 10
-            result["insider_trades"] = _get_insider_trades(ticker, limit=limit_to_use)
+            fetches["insider_trades"] = partial(_get_insider_trades, ticker, limit=limit_to_use)
 
 
         if effective_data_type in ["prices", "all"]:
@@ -476,16 +796,18 @@ async def financial_data_search(ticker: str,
             interval_to_use = price_interval if price_interval else 'day'
             multiplier_to_use = price_interval_multiplier if price_interval_multiplier is not None else 1
             
-            # Default dates: today and 90 days ago
+            # Default dates: today and a window sized to the interval
             today = datetime.utcnow().date()
             end_date_to_use = price_end_date if price_end_date else today.strftime('%Y-%m-%d')
-            start_date_default = (today - timedelta(days=90)).strftime('%Y-%m-%d')
+            window_days = _default_price_window_days(interval_to_use, multiplier_to_use)
+            start_date_default = (today - timedelta(days=window_days)).strftime('%Y-%m-%d')
             start_date_to_use = price_start_date if price_start_date else start_date_default
             
             # Limit is optional in the API call itself, pass it directly
             limit_to_use = price_limit 
             
-            result["prices"] = _get_stock_prices(
+            fetches["prices"] = partial(
+                _get_stock_prices,
                 ticker=ticker, 
                 interval=interval_to_use, 
                 interval_multiplier=multiplier_to_use, 
@@ -494,10 +816,9 @@ async def financial_data_search(ticker: str,
                 limit=limit_to_use # Pass None if not specified by user, API defaults to 5000
             )
 
-        #if effective_data_type in ["press-releases", "all"]:
-        #    result["press_releases"] = _get_press_releases(ticker, limit=1)
+        result, failures = await _fetch_concurrently(fetches)
 
-        return _format_financial_data(result, ticker)
+        return _format_financial_data(result, ticker, failures)
     except Exception as e:
-        print("Debug: error", e)
+        logger.error("Error retrieving financial data for %s: %s", ticker, e)
         return f"Error retrieving financial data for {ticker}: {str(e)}" 
\ No newline at end of file
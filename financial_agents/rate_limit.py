@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import deque
+
+
+class AdaptiveConcurrencyLimiter:
+    """
+    Process-wide cap on concurrent API requests, adjusted with AIMD
+    (additive increase, multiplicative decrease). Each successful response
+    grows the limit by `increase` up to `max_limit`. Each throttled or failed
+    response halves it, down to `min_limit`, so bursts from parallel tool calls
+    settle near the rate the provider actually accepts.
+
+    Thread-based because API fetches run in worker threads, possibly from
+    several event loops (e.g. one per Streamlit run).
+    """
+
+    def __init__(self, initial_limit: float, min_limit: float = 1, max_limit: float = 20,
+                 increase: float = 0.5, decrease: float = 0.5) -> None:
+        self.limit = float(initial_limit)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.increase = increase
+        self.decrease = decrease
+        self._active = 0
+        self._condition = threading.Condition()
+
+    def __enter__(self) -> "AdaptiveConcurrencyLimiter":
+        with self._condition:
+            while self._active >= int(self.limit):
+                self._condition.wait()
+            self._active += 1
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        with self._condition:
+            self._active -= 1
+            self._condition.notify()
+
+    def on_success(self) -> None:
+        with self._condition:
+            previous = int(self.limit)
+            self.limit = min(self.max_limit, self.limit + self.increase)
+            if int(self.limit) > previous:
+                self._condition.notify(int(self.limit) - previous)
+
+    def on_throttle(self) -> None:
+        with self._condition:
+            self.limit = max(self.min_limit, self.limit * self.decrease)
+
+
+class RequestRateLimiter:
+    """
+    Sliding-window limiter allowing at most `max_requests` calls per `period`
+    seconds. `acquire()` blocks until a slot is free, so requests are paced
+    up front instead of being rejected and retried. A `max_requests` of 0
+    disables the limit.
+    """
+
+    def __init__(self, max_requests: int, period: float = 60.0) -> None:
+        self.max_requests = max_requests
+        self.period = period
+        self._timestamps: deque = deque()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if self.max_requests <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                while self._timestamps and now - self._timestamps[0] >= self.period:
+                    self._timestamps.popleft()
+                if len(self._timestamps) < self.max_requests:
+                    self._timestamps.append(now)
+                    return
+                wait = self.period - (now - self._timestamps[0])
+            time.sleep(wait)
@@ -1,7 +1,7 @@
-from pydantic import BaseModel
-
 from agents import Agent
 
+from financial_agents.financials_agent import AnalysisSummary
+
 # A sub‑agent specializing in identifying risk factors or concerns.
 RISK_PROMPT = (
     "You are a risk analyst looking for potential red flags in a company's outlook. "
@@ -9,12 +9,6 @@ RISK_PROMPT = (
     "regulatory issues, supply chain problems, or slowing growth. Keep it under 2 paragraphs."
 )
 
-
-class AnalysisSummary(BaseModel):
-    summary: str
-    """Short text summary for this aspect of the analysis."""
-
-
 risk_agent = Agent(
     name="RiskAnalystAgent",
     instructions=RISK_PROMPT,
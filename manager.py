@@ -1,15 +1,18 @@
 from __future__ import annotations
 
 import asyncio
-import json
-import time
+import io
+import logging
+import re
 from collections.abc import Sequence
 from typing import Any, Dict
 
+from pydantic import ValidationError
 from rich.console import Console
 
-from agents import Runner, RunResult, custom_span, gen_trace_id, trace
+from agents import Runner, RunResult, ToolCallOutputItem, custom_span, gen_trace_id, trace
 
+from financial_agents.cache import FileCache
 from financial_agents.financials_agent import financials_agent
 from financial_agents.planner_agent import FinancialSearchItem, FinancialSearchPlan, planner_agent
 from financial_agents.risk_agent import risk_agent
@@ -17,8 +20,26 @@ from financial_agents.search_agent import search_agent
 from financial_agents.verifier_agent import VerificationResult, verifier_agent
 from financial_agents.writer_agent import FinancialReportData, writer_agent
 from financial_agents.financial_data_agent import financial_data_agent, FinancialDataAnalysis
+from financial_agents.financial_data_tool import FAILED_SECTION_NOTE
 from printer import Printer
 
+logger = logging.getLogger(__name__)
+
+# Web search summaries are reused for a day; the same search terms come up
+# across related queries and follow-up sessions.
+SEARCH_CACHE_TTL = 24 * 60 * 60  # seconds
+
+# The financial data agent's analysis of a query is reused for an hour, matching
+# the in-memory API response cache, so re-running a query skips that LLM run.
+FINANCIAL_DATA_CACHE_TTL = 60 * 60  # seconds
+
+# Search plans are reused for as long as the searches they lead to; a repeated
+# query skips the planner's LLM run.
+SEARCH_PLAN_CACHE_TTL = SEARCH_CACHE_TTL
+
+# Upper bound on a single web search so one slow search can't hold up the report.
+SEARCH_TIMEOUT = 60  # seconds
+
 
 async def _summary_extractor(run_result: RunResult) -> str:
     """Custom output extractor for sub‑agents that return an AnalysisSummary."""
@@ -27,6 +48,48 @@ async def _summary_extractor(run_result: RunResult) -> str:
     return str(run_result.final_output.summary)
 
 
+def _query_cache_key(query: str) -> str:
+    """Normalize a user query so trivially different spellings share cache entries."""
+    return re.sub(r"\s+", " ", query.strip().lower())
+
+
+# What financial_data_search returns for a rejected or failed call, and what the
+# Agents SDK substitutes when a tool raises.
+_TOOL_ERROR_PREFIXES = ("Error", "An error occurred while running the tool")
+
+
+def _is_cacheable_analysis(result: RunResult, analysis: FinancialDataAnalysis) -> bool:
+    """
+    Only reuse an analysis built from real data: the agent called the data tool,
+    none of those calls failed (even for a single section), and it identified a ticker.
+    Otherwise an API outage or missing key would keep serving an all-"not available"
+    analysis after recovery.
+    """
+    outputs = [str(item.output) for item in result.new_items if isinstance(item, ToolCallOutputItem)]
+    if not outputs or analysis.ticker == "N/A":
+        return False
+    return not any(output.startswith(_TOOL_ERROR_PREFIXES) or FAILED_SECTION_NOTE in output for output in outputs)
+
+
+# Expose the specialist analysts as tools so the writer can invoke them inline.
+# The tools and the writer clone are the same for every run, so build them once.
+_fundamentals_tool = financials_agent.as_tool(
+    tool_name="fundamentals_analysis",
+    tool_description="Use to get a short write‑up of key financial metrics",
+    custom_output_extractor=_summary_extractor,
+)
+_risk_tool = risk_agent.as_tool(
+    tool_name="risk_analysis",
+    tool_description="Use to get a short write‑up of potential red flags",
+    custom_output_extractor=_summary_extractor,
+)
+_analyst_tool = financial_data_agent.as_tool(
+    tool_name="financial_data_analysis",
+    tool_description="Use to get a detailed analysis of financial data",
+)
+_writer_with_tools = writer_agent.clone(tools=[_fundamentals_tool, _risk_tool, _analyst_tool])
+
+
 class FinancialResearchManager:
     """
     Orchestrates the full flow: planning, searching, sub‑analysis, writing, and verification.
@@ -35,6 +98,9 @@ class FinancialResearchManager:
     def __init__(self) -> None:
         self.console = Console()
         self.printer = Printer(self.console)
+        self.search_cache = FileCache("search", ttl=SEARCH_CACHE_TTL)
+        self.financial_data_cache = FileCache("financial_data_analysis", ttl=FINANCIAL_DATA_CACHE_TTL)
+        self.search_plan_cache = FileCache("search_plan", ttl=SEARCH_PLAN_CACHE_TTL)
 
     async def run(self, query: str) -> Dict[str, Any]:
         """Runs the full research process and returns the results."""
@@ -48,11 +114,16 @@ class FinancialResearchManager:
             )
             self.printer.update_item("start", "Starting financial research...", is_done=True)
             
-            # Get financial data using the new agent
-            financial_data = await self._get_financial_data(query)
-            # print the financial data to the console
-            search_plan = await self._plan_searches(query)
-            search_results = await self._perform_searches(search_plan)
+            # Financial data retrieval and the plan -> search pipeline are independent
+            # LLM/API round trips, so run them concurrently.
+            financial_data_task = asyncio.create_task(self._get_financial_data(query))
+            try:
+                search_results = await self._plan_and_search(query)
+            except BaseException:
+                # Don't leave the data retrieval running unattended once the run has failed
+                financial_data_task.cancel()
+                raise
+            financial_data = await financial_data_task
             
             # Write the textual report (chart data handled separately)
             report_data = await self._write_report(query, search_results, financial_data)
@@ -81,14 +152,25 @@ class FinancialResearchManager:
         self.printer.update_item("financial_data", "Retrieving and analyzing financial data...")
         
         try:
-            print(f"[DEBUG - _get_financial_data] Company/Ticker: {company_info}")
+            logger.debug("_get_financial_data company/ticker: %s", company_info)
 
-            result = await Runner.run(financial_data_agent, f"Company/Ticker: {company_info}")
-            print(f"[DEBUG - _get_financial_data] Result: {result}")
-            
-            financial_data = result.final_output_as(FinancialDataAnalysis)
-            print(f"[DEBUG - _get_financial_data] Financial Data: {financial_data}")
+            cache_key = _query_cache_key(company_info)
+            cached = await asyncio.to_thread(self.financial_data_cache.get, cache_key)
+            financial_data = None
+            if cached is not None:
+                try:
+                    financial_data = FinancialDataAnalysis.model_validate(cached)
+                except ValidationError:
+                    # Stale or corrupt entry (e.g. from an older model); treat it as a miss
+                    logger.debug("Ignoring invalid cached financial data for %s", cache_key)
+            if financial_data is None:
+                result = await Runner.run(financial_data_agent, f"Company/Ticker: {company_info}")
+                logger.debug("_get_financial_data result: %s", result)
 
+                financial_data = result.final_output_as(FinancialDataAnalysis)
+                if _is_cacheable_analysis(result, financial_data):
+                    await asyncio.to_thread(self.financial_data_cache.set, cache_key, financial_data.model_dump())
+            logger.debug("_get_financial_data financial data: %s", financial_data)
 
             self.printer.update_item(
                 "financial_data",
@@ -103,40 +185,42 @@ class FinancialResearchManager:
                 is_done=True,
             )
             # Return an empty financial data object if retrieval fails
-            # Ensure all required fields have default values
-            return FinancialDataAnalysis(
-                ticker="N/A",
-                company_name="N/A",
-                financial_summary="Failed to retrieve financial data.",
-                company_info_markdown="Data not available.",
-                news_markdown="Data not available.",
-                institutional_ownership_markdown="Data not available.",
-                key_metrics_markdown="Data not available.",
-                segmented_revenues_markdown="Data not available.",
-                income_statements_markdown="Data not available.",
-                balance_sheets_markdown="Data not available.",
-                cash_flows_markdown="Data not available.",
-                insider_trades_markdown="Data not available.",
-                stock_prices_markdown="Data not available.",
-                press_releases_markdown="Data not available.",
-                growth_analysis="Data not available.",
-                risk_factors="Data not available."
-            )
+            return FinancialDataAnalysis.empty()
+
+    async def _plan_and_search(self, query: str) -> Sequence[str]:
+        search_plan = await self._plan_searches(query)
+        return await self._perform_searches(search_plan)
 
     async def _plan_searches(self, query: str) -> FinancialSearchPlan:
         self.printer.update_item("planning", "Planning searches...")
-        result = await Runner.run(planner_agent, f"Query: {query}")
+        cache_key = _query_cache_key(query)
+        cached = await asyncio.to_thread(self.search_plan_cache.get, cache_key)
+        search_plan = None
+        if cached is not None:
+            try:
+                search_plan = FinancialSearchPlan.model_validate(cached)
+            except ValidationError:
+                # Stale or corrupt entry (e.g. from an older planner schema); treat it as a miss
+                logger.debug("Ignoring invalid cached search plan for %s", cache_key)
+        if search_plan is None:
+            result = await Runner.run(planner_agent, f"Query: {query}")
+            search_plan = result.final_output_as(FinancialSearchPlan)
+            await asyncio.to_thread(self.search_plan_cache.set, cache_key, search_plan.model_dump())
         self.printer.update_item(
             "planning",
-            f"Will perform {len(result.final_output.searches)} searches",
+            f"Will perform {len(search_plan.searches)} searches",
             is_done=True,
         )
-        return result.final_output_as(FinancialSearchPlan)
+        return search_plan
 
     async def _perform_searches(self, search_plan: FinancialSearchPlan) -> Sequence[str]:
         with custom_span("Search the web"):
             self.printer.update_item("searching", "Searching...")
-            tasks = [asyncio.create_task(self._search(item)) for item in search_plan.searches]
+            # The planner often repeats a search term; only run each distinct one once.
+            unique_items: dict[str, FinancialSearchItem] = {}
+            for item in search_plan.searches:
+                unique_items.setdefault(_query_cache_key(item.query), item)
+            tasks = [asyncio.create_task(self._search(item)) for item in unique_items.values()]
             results: list[str] = []
             num_completed = 0
             for task in asyncio.as_completed(tasks):
@@ -151,10 +235,18 @@ class FinancialResearchManager:
             return results
 
     async def _search(self, item: FinancialSearchItem) -> str | None:
+        cache_key = _query_cache_key(item.query)
+        # Cache reads/writes are file I/O; keep them off the event loop shared with other searches
+        cached = await asyncio.to_thread(self.search_cache.get, cache_key)
+        if cached is not None:
+            return cached
+
         input_data = f"Search term: {item.query}\nReason: {item.reason}"
         try:
-            result = await Runner.run(search_agent, input_data)
-            return str(result.final_output)
+            result = await asyncio.wait_for(Runner.run(search_agent, input_data), timeout=SEARCH_TIMEOUT)
+            summary = str(result.final_output)
+            await asyncio.to_thread(self.search_cache.set, cache_key, summary)
+            return summary
         except Exception:
             return None
 
@@ -164,24 +256,6 @@ class FinancialResearchManager:
         search_results: Sequence[str],
         financial_data: FinancialDataAnalysis,
     ) -> FinancialReportData:
-        # Expose the specialist analysts as tools so the writer can invoke them inline
-        fundamentals_tool = financials_agent.as_tool(
-            tool_name="fundamentals_analysis",
-            tool_description="Use to get a short write‑up of key financial metrics",
-            custom_output_extractor=_summary_extractor,
-        )
-        risk_tool = risk_agent.as_tool(
-            tool_name="risk_analysis",
-            tool_description="Use to get a short write‑up of potential red flags",
-            custom_output_extractor=_summary_extractor,
-        )
-
-        analyst_tool = financial_data_agent.as_tool(
-            tool_name="financial_data_analysis",
-            tool_description="Use to get a detailed analysis of financial data",
-        )
-
-        writer_with_tools = writer_agent.clone(tools=[fundamentals_tool, risk_tool, analyst_tool])
         self.printer.update_item("writing", "Synthesizing report...")
 
         # Helper to insert explicit missing data messages
@@ -189,24 +263,29 @@ class FinancialResearchManager:
             return section if section and section.strip() else f"**{label}: Data not available.**\n"
 
         # Construct detailed financial data context using the _markdown fields
-        detailed_financial_data_context = f"### Financial Data Context for {financial_data.company_name} ({financial_data.ticker})\n\n"
-        detailed_financial_data_context += f"#### Overall Summary\n{section_or_na(financial_data.financial_summary, 'Overall Summary')}\n\n"
-        detailed_financial_data_context += f"#### Growth Analysis Summary\n{section_or_na(financial_data.growth_analysis, 'Growth Analysis Summary')}\n\n"
-        detailed_financial_data_context += section_or_na(financial_data.company_info_markdown, 'Company Info') + "\n"
-        detailed_financial_data_context += section_or_na(financial_data.key_metrics_markdown, 'Key Metrics') + "\n"
-        detailed_financial_data_context += section_or_na(financial_data.segmented_revenues_markdown, 'Segmented Revenues') + "\n"
-        detailed_financial_data_context += section_or_na(financial_data.income_statements_markdown, 'Income Statements') + "\n"
-        detailed_financial_data_context += section_or_na(financial_data.balance_sheets_markdown, 'Balance Sheets') + "\n"
-        detailed_financial_data_context += section_or_na(financial_data.cash_flows_markdown, 'Cash Flow Statements') + "\n"
-        detailed_financial_data_context += section_or_na(financial_data.news_markdown, 'Recent News') + "\n"
-        detailed_financial_data_context += section_or_na(financial_data.institutional_ownership_markdown, 'Top Institutional Holders') + "\n"
-        detailed_financial_data_context += section_or_na(financial_data.insider_trades_markdown, 'Recent Insider Trades') + "\n"
-        detailed_financial_data_context += section_or_na(financial_data.stock_prices_markdown, 'Recent Stock Prices') + "\n"
-        detailed_financial_data_context += section_or_na(financial_data.press_releases_markdown, 'Latest Earnings Press Release') + "\n"
+        context = io.StringIO()
+        context.write(f"### Financial Data Context for {financial_data.company_name} ({financial_data.ticker})\n\n")
+        context.write(f"#### Overall Summary\n{section_or_na(financial_data.financial_summary, 'Overall Summary')}\n\n")
+        context.write(f"#### Growth Analysis Summary\n{section_or_na(financial_data.growth_analysis, 'Growth Analysis Summary')}\n\n")
+        for section, label in (
+            (financial_data.company_info_markdown, 'Company Info'),
+            (financial_data.key_metrics_markdown, 'Key Metrics'),
+            (financial_data.segmented_revenues_markdown, 'Segmented Revenues'),
+            (financial_data.income_statements_markdown, 'Income Statements'),
+            (financial_data.balance_sheets_markdown, 'Balance Sheets'),
+            (financial_data.cash_flows_markdown, 'Cash Flow Statements'),
+            (financial_data.news_markdown, 'Recent News'),
+            (financial_data.institutional_ownership_markdown, 'Top Institutional Holders'),
+            (financial_data.insider_trades_markdown, 'Recent Insider Trades'),
+            (financial_data.stock_prices_markdown, 'Recent Stock Prices'),
+            (financial_data.press_releases_markdown, 'Latest Earnings Press Release'),
+        ):
+            context.write(section_or_na(section, label) + "\n")
         if financial_data.risk_factors:
-            detailed_financial_data_context += f"#### Mentioned Risk Factors\n{section_or_na(financial_data.risk_factors, 'Risk Factors')}\n\n"
+            context.write(f"#### Mentioned Risk Factors\n{section_or_na(financial_data.risk_factors, 'Risk Factors')}\n\n")
         else:
-            detailed_financial_data_context += f"#### Mentioned Risk Factors\n**Risk Factors: Data not available.**\n\n"
+            context.write("#### Mentioned Risk Factors\n**Risk Factors: Data not available.**\n\n")
+        detailed_financial_data_context = context.getvalue()
 
         # Combine search results into a single string
         search_context = "\n\n".join(search_results) if search_results else "**Web search results: Data not available.**"
@@ -217,7 +296,7 @@ class FinancialResearchManager:
             f"{detailed_financial_data_context}"
         )
 
-        result = await Runner.run(writer_with_tools, input_data)
+        result = await Runner.run(_writer_with_tools, input_data)
         self.printer.update_item("writing", "Report generated", is_done=True)
         return result.final_output_as(FinancialReportData)
 